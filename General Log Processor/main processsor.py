@@ -5,9 +5,23 @@ import argparse
 import logging
 import sys
 import csv
-import chardet
+import codecs
+import heapq
+import operator
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from collections import deque, defaultdict
+try:
+    # Faster drop-in for chardet.detect when installed
+    from charset_normalizer import detect as detect_charset
+except ImportError:
+    from chardet import detect as detect_charset
+try:
+    # Optional DFA engine used to find candidate lines in whole-file scans
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 
 class ConfigLoader:
@@ -28,7 +42,9 @@ class ConfigLoader:
         "PATTERN_CONFIG": {},
         "EVENT_SEQUENCE": [],
         "CSV_FIELDS": [],
-        "LOG_LEVEL": "INFO"
+        "LOG_LEVEL": "INFO",
+        "MAX_WORKERS": None,
+        "USE_HYPERSCAN": False
     }
 
     @staticmethod
@@ -68,6 +84,12 @@ class ConfigLoader:
                 logging.error(f"Event '{evt}' in sequence not in PATTERN_CONFIG")
                 sys.exit(1)
 
+        # MAX_WORKERS is null (one per CPU) or a positive process count
+        workers = cfg.get('MAX_WORKERS')
+        if workers is not None and not (isinstance(workers, int) and workers >= 1):
+            logging.error(f"Invalid MAX_WORKERS: {workers!r} (use null or a number >= 1)")
+            sys.exit(1)
+
         # Validate log folder exists
         if not os.path.isdir(cfg['FOLDER_PATH']):
             logging.error(f"Invalid FOLDER_PATH: {cfg['FOLDER_PATH']}")
@@ -76,39 +98,380 @@ class ConfigLoader:
         return cfg
 
 
+class Event:
+    """A parsed log line: timestamp, source file, stage and matched fields."""
+    __slots__ = ('time', 'file', 'type', 'type_id', 'fields')
+
+    def __init__(self, time, file, type, type_id, fields):
+        self.time = time
+        self.file = file
+        self.type = type        # stage name, kept for logging
+        self.type_id = type_id  # stage index in EVENT_SEQUENCE
+        self.fields = fields    # tuple of (field, value) pairs
+
+
+BY_TIME = operator.attrgetter('time')   # sort/merge key for events
+
+
+class TimingSeries:
+    """Parallel per-field raw value lists for the repeating last stage of a cycle."""
+    __slots__ = ('times', 'values')
+
+    def __init__(self, fields):
+        self.times = []
+        self.values = {field: [] for field in fields}
+
+    def add(self, event):
+        """Append an event's time and the raw value of each tracked field."""
+        self.times.append(event.time)
+        fields = dict(event.fields)
+        for field, values in self.values.items():
+            values.append(fields.get(field, '0'))
+
+    def array(self, field):
+        """Return a field's values as floats, dropping non-numeric entries."""
+        raw = self.values[field]
+        try:
+            return np.asarray(raw, dtype=np.float64)
+        except ValueError:
+            numeric = []
+            for v in raw:
+                try:
+                    numeric.append(float(v))
+                except ValueError:
+                    continue
+            return np.asarray(numeric, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.times)
+
+
+class LogParser:
+    """
+    Turns log files into Events using the configured timestamp formats and
+    field patterns. Holds only parsing state, so pool workers each build one.
+    """
+    TS_CACHE_SIZE = 100000      # parsed timestamps memoized before the cache resets
+    READ_BUFFER_SIZE = 1024 * 1024      # fewer read syscalls than the 8 KiB default
+    WHOLE_FILE_LIMIT = 64 * 1024 * 1024  # larger files are streamed line by line
+    ENCODING_SAMPLE_SIZE = 64 * 1024     # bytes inspected by detect_encoding
+    # UTF-32 LE's BOM starts with UTF-16 LE's, so it must be checked first
+    BOMS = (
+        (codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16'),
+    )
+    # Backreferences/conditionals, whose group numbers shift inside an alternation
+    GROUP_REF_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+    def __init__(self, config):
+        self.config = config
+        self.file_encodings = {}
+        self._ts_cache = {}         # raw timestamp string -> datetime
+        self._last_fmt = None       # last TIMESTAMP_FORMATS entry that parsed
+        # Checked once so per-line debug messages cost nothing when disabled;
+        # build the parser after logging is configured.
+        self._debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+        # Precompile regexes once so the per-line hot path avoids re's cache lookup.
+        # Default (Unicode) semantics are kept on purpose: re.ASCII or bytes
+        # patterns measured no faster here and would change what \s, \d and \w
+        # match in non-ASCII logs.
+        self._compiled_patterns = {
+            evt: {field: re.compile(pat) for field, pat in patterns.items()}
+            for evt, patterns in config['PATTERN_CONFIG'].items()
+        }
+        self._ts_re = re.compile(r"\[([^\]]+)\]")
+        # Same extractor anchored per line, for scanning a whole file buffer. The
+        # match keeps the trailing newline, as line iteration does.
+        self._ts_line_re = re.compile(r"^[^\n]*?\[([^\]\n]+)\][^\n]*\n?", re.MULTILINE)
+
+        # (stage index, event, ((field, regex), ...)) in EVENT_SEQUENCE order
+        self._stages = [
+            (evt_idx, evt, tuple(self._compiled_patterns[evt].items()))
+            for evt_idx, evt in enumerate(config['EVENT_SEQUENCE'])
+        ]
+        # One alternation over every sequence field, used only as a single-pass
+        # "does any field match" gate. Patterns that depend on group numbering
+        # (backreferences, conditionals) or can't be joined (global inline
+        # flags, duplicate group names) leave it disabled.
+        sources = [regex.pattern for _, _, patterns in self._stages
+                   for _, regex in patterns]
+        self._combined = None
+        if sources and not any(self.GROUP_REF_RE.search(p) for p in sources):
+            try:
+                self._combined = re.compile("|".join(f"(?:{p})" for p in sources))
+            except re.error:
+                pass
+        # Literal prefixes every field match must contain; a line holding none
+        # of them skips the regex scan. Disabled if any pattern lacks a prefix.
+        hints = [self.literal_prefix(pat)
+                 for evt in config['EVENT_SEQUENCE']
+                 for pat in config['PATTERN_CONFIG'][evt].values()]
+        self._field_hints = tuple(dict.fromkeys(hints)) if all(hints) else None
+        # Opt-in: on logs where most lines carry fields, re alone is faster
+        self._hs_db = None
+        if config.get('USE_HYPERSCAN', False):
+            self._hs_db = self.compile_hyperscan(self._field_hints)
+
+    @staticmethod
+    def literal_prefix(pattern):
+        """Return the literal text a regex must start with ('' if unknown)."""
+        if '|' in pattern:
+            return ''
+        prefix = []
+        for ch in pattern:
+            if ch in '.^$*+?{}[]\\|()':
+                # A quantifier makes the preceding character optional
+                if ch in '*?{' and prefix:
+                    prefix.pop()
+                break
+            prefix.append(ch)
+        return ''.join(prefix)
+
+    @staticmethod
+    def compile_hyperscan(literals):
+        """Compile field literals into a Hyperscan database, or None if unavailable."""
+        if hyperscan is None:
+            logging.warning("USE_HYPERSCAN is set but hyperscan is not installed, using re")
+            return None
+        if not literals:
+            logging.warning("Hyperscan needs a literal prefix on every field pattern, using re")
+            return None
+        # Literals report each occurrence once; regexes with repeats report
+        # every end offset, i.e. one Python callback per matched character.
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[lit.encode('utf-8') for lit in literals],
+                ids=list(range(len(literals))),
+                flags=0,
+                literal=True
+            )
+        except hyperscan.error as e:
+            logging.warning(f"Hyperscan cannot compile patterns, using re: {e}")
+            return None
+        return db
+
+    def detect_encoding(self, path):
+        """Detect and cache file encoding from a sampled prefix of the file."""
+        if path in self.file_encodings:
+            return self.file_encodings[path]
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read(self.ENCODING_SAMPLE_SIZE)
+            enc = next((e for bom, e in self.BOMS if raw.startswith(bom)), None)
+            # Most logs are UTF-8/ASCII; NUL bytes hint at UTF-16/32 instead
+            if enc is None and b'\x00' not in raw:
+                try:
+                    # final=False tolerates a multi-byte character cut by the sample
+                    codecs.getincrementaldecoder('utf-8')().decode(raw, final=False)
+                    enc = 'utf-8'
+                except UnicodeDecodeError:
+                    pass
+            if enc is None:
+                enc = detect_charset(raw)['encoding'] or 'utf-8'
+        except Exception:
+            enc = 'utf-8'
+        self.file_encodings[path] = enc
+        return enc
+
+    def parse_file(self, path):
+        """Parse each timestamped line of a file into a time-sorted list of events."""
+        # The learned format (and results parsed with it) must not leak between
+        # files, or a pool worker's output would depend on its file order.
+        self._last_fmt = None
+        self._ts_cache.clear()
+        enc = self.detect_encoding(path)
+        with open(path, 'r', encoding=enc, errors='replace',
+                  buffering=self.READ_BUFFER_SIZE) as f:
+            if os.fstat(f.fileno()).st_size <= self.WHOLE_FILE_LIMIT:
+                events = self.parse_buffer(f.read(), path)
+            else:
+                events = []
+                for line in f:
+                    event = self.parse_line(line, path)
+                    if event is not None:
+                        events.append(event)
+        # Sorting here keeps it in the pool worker; files are normally already
+        # time-ordered, which makes this a single pass.
+        events.sort(key=BY_TIME)
+        return events
+
+    def parse_buffer(self, data, filename):
+        """Parse every timestamped line of an in-memory file."""
+        if self._hs_db is not None:
+            return self.scan_buffer(data, filename)
+        events = []
+        # Lines without a bracketed timestamp never leave the regex engine
+        for m in self._ts_line_re.finditer(data):
+            ts = self.parse_timestamp(m.group(1))
+            if ts:
+                event = self.match_event(ts, m.group(0), filename)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def scan_buffer(self, data, filename):
+        """Parse only the lines in which Hyperscan finds a field literal."""
+        buf = data.encode('utf-8', errors='replace')
+        ends = []
+        self._hs_db.scan(buf, match_event_handler=lambda _id, start, end, flags, ctx: ends.append(end))
+        events = []
+        line_end = -1
+        # A hit belongs to the line holding its last byte
+        for end in sorted(ends):
+            if end - 1 <= line_end:
+                continue
+            line_start = buf.rfind(b'\n', 0, end - 1) + 1
+            line_end = buf.find(b'\n', end - 1)
+            if line_end == -1:
+                line_end = len(buf)
+            line = buf[line_start:line_end + 1].decode('utf-8')
+            event = self.parse_line(line, filename)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def parse_line(self, line, filename):
+        """Extract timestamp and event fields from a log line."""
+        ts = self.extract_timestamp(line)
+        if ts:
+            return self.match_event(ts, line, filename)
+        return None
+
+    def match_event(self, ts, line, filename):
+        """Build an event for the first EVENT_SEQUENCE stage matching the line."""
+        hints = self._field_hints
+        # Cheap gates first: a field literal, then one pass of the combined regex
+        if ((hints is None or any(h in line for h in hints))
+                and (self._combined is None or self._combined.search(line))):
+            # Earliest stage in EVENT_SEQUENCE wins when a line matches several.
+            # Fields are searched one by one so overlapping matches and group
+            # references behave as if each pattern ran alone.
+            for evt_idx, evt, patterns in self._stages:
+                fields = None
+                for field, regex in patterns:
+                    m = regex.search(line)
+                    if m:
+                        if fields is None:
+                            fields = []
+                        fields.append((field, m.group(1).strip()))
+                if fields is not None:
+                    return Event(ts, filename, evt, evt_idx, tuple(fields))
+        if self._debug:
+            logging.debug("No pattern matched: %s", line.strip())
+        return None
+
+    def extract_timestamp(self, line):
+        """Parse timestamp in brackets using configured formats."""
+        if '[' not in line:
+            return None
+        m = self._ts_re.search(line)
+        if not m:
+            return None
+        return self.parse_timestamp(m.group(1))
+
+    def parse_timestamp(self, ts_str):
+        """
+        Convert a bracketed timestamp string using configured formats.
+        The format that last matched in the current file is tried first, so a
+        string valid under several formats takes that one, not the first listed.
+        """
+        cached = self._ts_cache.get(ts_str)
+        if cached is not None:
+            return cached
+        # Logs almost always use a single format, so try the last hit first
+        dt = None
+        if self._last_fmt is not None:
+            try:
+                dt = datetime.strptime(ts_str, self._last_fmt)
+            except ValueError:
+                pass
+        if dt is None:
+            for fmt in self.config['TIMESTAMP_FORMATS']:
+                if fmt == self._last_fmt:
+                    continue
+                try:
+                    dt = datetime.strptime(ts_str, fmt)
+                except ValueError:
+                    continue
+                self._last_fmt = fmt
+                break
+            else:
+                if self._debug:
+                    logging.debug("Unrecognized timestamp: %s", ts_str)
+                return None
+        if len(self._ts_cache) >= self.TS_CACHE_SIZE:
+            self._ts_cache.clear()
+        self._ts_cache[ts_str] = dt
+        return dt
+
+
+def configure_logging(level):
+    """Log to console + log_processor.log; no-op if root logging is already set up."""
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[
+            logging.FileHandler("log_processor.log"),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+# Per-process parser for pool workers, built once by _init_worker
+_worker_parser = None
+
+
+def _init_worker(config, log_level):
+    global _worker_parser
+    # Spawned workers start with unconfigured logging; set it up before
+    # LogParser reads the DEBUG level and compiles its patterns.
+    configure_logging(log_level)
+    _worker_parser = LogParser(config)
+
+
+def parse_file(path):
+    """Parse one log file with the current worker's LogParser."""
+    return _worker_parser.parse_file(path)
+
+
 class GenericLogProcessor:
     """
     Processes instrument log files into a CSV using a configurable state machine.
     """
     VERSION = "1.3.0"
+    RESULTS_KEPT = 100          # recent records retained in memory after writing
 
     def __init__(self, config):
         self.config = config
-        self.events = []            # collected events
-        self.results = []           # finalized cycle records
+        self._events_by_file = {}   # file path -> time-sorted events
+        self.results = deque(maxlen=self.RESULTS_KEPT)  # most recent finalized records
+        self._writer = None         # CSV writer records stream to while analyzing
         self.pending_cycles = deque()
         self.metrics = defaultdict(int)
-        self.file_encodings = {}
+        self._exts_tuple = tuple(config['LOG_EXTENSIONS'])  # str.endswith accepts a tuple
+        self._seq_idx = {evt: i for i, evt in enumerate(config['EVENT_SEQUENCE'])}
+        # Cycles are lists indexed by stage id, cloned from this template
+        self._cycle_template = [None] * len(config['EVENT_SEQUENCE'])
+        self._last_idx = len(config['EVENT_SEQUENCE']) - 1
 
         # Configure logging: console + file
-        logging.basicConfig(
-            level=getattr(logging, config['LOG_LEVEL']),
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            handlers=[
-                logging.FileHandler("log_processor.log"),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        configure_logging(getattr(logging, config['LOG_LEVEL']))
         logging.info(f"Initialized LogProcessor v{self.VERSION}")
+        self.parser = LogParser(config)
 
     def process_files(self, output_csv=None):
         """
         Main pipeline:
           1. Optional rename logs
           2. Gather file paths
-          3. Parse each file into events
+          3. Parse files into events across worker processes
           4. Analyze events into cycles
-          5. Save CSV and print summary
+          5. Stream records to CSV and print summary
         """
         if self.config['RENAME_LOGS']:
             self.rename_logs()
@@ -118,18 +481,28 @@ class GenericLogProcessor:
             logging.error("No log files found.")
             return
 
-        for path in file_paths:
-            self.process_file(path)
+        self.parse_files(file_paths)
 
-        self.analyze_events()
-        self.save_results(output_csv or self.config['OUTPUT_CSV'])
+        output_path = output_csv or self.config['OUTPUT_CSV']
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            self._writer = csv.DictWriter(f, fieldnames=self.config['CSV_FIELDS'])
+            self._writer.writeheader()
+            try:
+                self.analyze_events()
+            finally:
+                self._writer = None
+        if self.metrics['records_saved']:
+            logging.info(f"Saved {self.metrics['records_saved']} records to {output_path}")
+        else:
+            logging.warning("No results to save.")
         self.print_summary()
 
     def rename_logs(self):
         """Rename raw log files by appending NEW_EXT."""
         folder = self.config['FOLDER_PATH']
         for fname in os.listdir(folder):
-            if any(fname.endswith(ext) for ext in self.config['LOG_EXTENSIONS']):
+            if fname.endswith(self._exts_tuple):
                 root, _ = os.path.splitext(fname)
                 newname = root + self.config['NEW_EXT']
                 os.rename(
@@ -140,12 +513,23 @@ class GenericLogProcessor:
 
     def gather_files(self):
         """Recursively collect log files matching LOG_EXTENSIONS, sorted naturally."""
-        exts = self.config['LOG_EXTENSIONS']
+        exts = self._exts_tuple
         paths = []
-        for root, _, files in os.walk(self.config['FOLDER_PATH']):
-            for f in files:
-                if any(f.endswith(ext) for ext in exts):
-                    paths.append(os.path.join(root, f))
+        stack = [self.config['FOLDER_PATH']]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            subdirs = []
+            with entries:
+                for e in entries:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    elif e.name.endswith(exts) and e.is_file():
+                        paths.append(e.path)
+            # Reversed so subdirectories pop in os.walk's (top-down) order
+            stack.extend(reversed(subdirs))
         paths.sort(key=self.natural_sort_key)
         logging.info(f"Found {len(paths)} log files")
         return paths
@@ -157,108 +541,91 @@ class GenericLogProcessor:
         parts = re.split(r'(\d+)', base)
         return [int(p) if p.isdigit() else p.lower() for p in parts]
 
-    def detect_encoding(self, path):
-        """Detect and cache file encoding using chardet."""
-        if path in self.file_encodings:
-            return self.file_encodings[path]
-        try:
-            raw = open(path, 'rb').read()
-            enc = chardet.detect(raw)['encoding'] or 'utf-8'
-        except Exception:
-            enc = 'utf-8'
-        self.file_encodings[path] = enc
-        return enc
+    def parse_files(self, file_paths):
+        """Parse files across worker processes; one file or worker stays in-process."""
+        workers = self.config.get('MAX_WORKERS') or os.cpu_count() or 1
+        workers = min(workers, len(file_paths))
+        # A lone worker would only add the cost of pickling events back
+        if workers <= 1:
+            for path in file_paths:
+                self.process_file(path)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config, logging.getLogger().level)) as ex:
+            futures = [ex.submit(parse_file, path) for path in file_paths]
+            for path, future in zip(file_paths, futures):
+                try:
+                    events = future.result()
+                except Exception as e:
+                    logging.error(f"Error processing {path}: {e}")
+                    continue
+                self.add_events(path, events)
 
     def process_file(self, path):
-        """Parse each line of a file into events."""
+        """Parse a single file in-process and collect its events."""
         try:
-            enc = self.detect_encoding(path)
-            with open(path, 'r', encoding=enc, errors='replace') as f:
-                for line in f:
-                    self.parse_line(line, path)
-            self.metrics['files_processed'] += 1
+            events = self.parser.parse_file(path)
         except Exception as e:
             logging.error(f"Error processing {path}: {e}")
-
-    def parse_line(self, line, filename):
-        """Extract timestamp and event fields from a log line."""
-        ts = self.extract_timestamp(line)
-        if not ts:
             return
-        for evt in self.config['EVENT_SEQUENCE']:
-            patterns = self.config['PATTERN_CONFIG'][evt]
-            matched = False
-            event = {'time': ts, 'file': filename, 'type': evt}
-            for field, pat in patterns.items():
-                m = re.search(pat, line)
-                if m:
-                    matched = True
-                    event[field] = m.group(1).strip()
-            if matched:
-                self.events.append(event)
-                self.metrics['events_parsed'] += 1
-                return
-        logging.debug(f"No pattern matched: {line.strip()}")
+        self.add_events(path, events)
 
-    def extract_timestamp(self, line):
-        """Parse timestamp in brackets using configured formats."""
-        m = re.search(r"\[([^\]]+)\]", line)
-        if not m:
-            return None
-        ts_str = m.group(1)
-        for fmt in self.config['TIMESTAMP_FORMATS']:
-            try:
-                return datetime.strptime(ts_str, fmt)
-            except ValueError:
-                continue
-        logging.debug(f"Unrecognized timestamp: {ts_str}")
-        return None
+    def add_events(self, path, events):
+        """Store a parsed file's events and update metrics."""
+        if events:
+            self._events_by_file[path] = events
+        self.metrics['files_processed'] += 1
+        self.metrics['events_parsed'] += len(events)
 
     def analyze_events(self):
         """Group events into cycles based on EVENT_SEQUENCE state machine."""
-        if not self.events:
+        if not self._events_by_file:
             logging.warning("No events to analyze.")
             return
         seq = self.config['EVENT_SEQUENCE']
-        self.events.sort(key=lambda e: e['time'])
+        # Each file's events arrive time-sorted from LogParser.parse_file, so
+        # merging the streams replaces a global sort.
+        ordered = heapq.merge(*self._events_by_file.values(), key=BY_TIME)
+        timing_fields = self.config['PATTERN_CONFIG'][seq[-1]]
+        last_idx = self._last_idx
+        done = len(seq)
         state = 0
-        cycle = {evt: None for evt in seq}
-        cycle[seq[-1]] = []  # last stage accumulates
+        cycle = self._cycle_template.copy()
+        cycle[last_idx] = TimingSeries(timing_fields)  # last stage accumulates
         source_files = set()
 
-        for ev in self.events:
-            try:
-                idx = seq.index(ev['type'])
-            except ValueError:
-                logging.debug(f"Unknown event type: {ev['type']}")
-                continue
+        for ev in ordered:
+            idx = ev.type_id
             if idx == 0:
-                if state == len(seq):
+                if state == done:
                     self.finalize_cycle(cycle, source_files)
                 state = 1
-                cycle = {evt: None for evt in seq}
-                cycle[seq[-1]] = []
-                cycle[ev['type']] = ev
-                source_files = {ev['file']}
+                cycle = self._cycle_template.copy()
+                cycle[last_idx] = TimingSeries(timing_fields)
+                cycle[0] = ev
+                source_files = {ev.file}
             elif idx == state:
-                if idx == len(seq) - 1:
-                    cycle[ev['type']].append(ev)
+                if idx == last_idx:
+                    cycle[idx].add(ev)
                 else:
-                    cycle[ev['type']] = ev
+                    cycle[idx] = ev
                 state += 1
-                source_files.add(ev['file'])
+                source_files.add(ev.file)
             else:
-                logging.warning(f"Unexpected event order: {ev['type']} at state {state}")
+                logging.warning(f"Unexpected event order: {ev.type} at state {state}")
                 state = 0
 
-        if state == len(seq):
+        if state == done:
             self.finalize_cycle(cycle, source_files)
 
     def finalize_cycle(self, cycle, source_files):
-        """Build and save a record if cycle is valid."""
+        """Build a record and stream it to the CSV if cycle is valid."""
         try:
             rec = self.build_record(cycle, source_files)
             if self.validate_record(rec):
+                if self._writer is not None:
+                    self._writer.writerow(rec)
+                    self.metrics['records_saved'] += 1
                 self.results.append(rec)
                 self.metrics['cycles_completed'] += 1
         except Exception as e:
@@ -266,40 +633,38 @@ class GenericLogProcessor:
             self.metrics['cycle_errors'] += 1
 
     def build_record(self, cycle, source_files):
-        """Construct a CSV record from cycle data."""
-        tech = cycle.get('technique')
-        qry  = cycle.get('query')
-        last_stage = self.config['EVENT_SEQUENCE'][-1]
-        timing_events = cycle.get(last_stage, [])
-
+        """Construct a CSV record from cycle data (a list indexed by stage id)."""
+        seq_idx = self._seq_idx
+        tech = cycle[seq_idx['technique']] if 'technique' in seq_idx else None
+        timing = cycle[self._last_idx]
+
+        if tech:
+            # Same as strftime("%y/%m/%d %H:%M:%S"), without the locale-aware path
+            t = tech.time
+            start = (f"{t.year % 100:02d}/{t.month:02d}/{t.day:02d} "
+                     f"{t.hour:02d}:{t.minute:02d}:{t.second:02d}")
+        else:
+            start = 'NA'
         record = {
             'SourceFiles': '+'.join(sorted(source_files)),
-            'StartTime': tech['time'].strftime("%y/%m/%d %H:%M:%S") if tech else 'NA'
+            'StartTime': start
         }
         # Merge technique and query fields
         for stage in ['query', 'technique']:
-            evt = cycle.get(stage)
+            evt = cycle[seq_idx[stage]] if stage in seq_idx else None
             if evt:
+                fields = dict(evt.fields)
                 for field in self.config['PATTERN_CONFIG'][stage]:
-                    record[field] = evt.get(field, 'NA')
+                    record[field] = fields.get(field, 'NA')
         # Calculate averages for timing fields
-        for field in self.config['PATTERN_CONFIG'][last_stage]:
-            values = []
-            for e in timing_events:
-                try:
-                    values.append(float(e.get(field, 0)))
-                except (ValueError, TypeError):
-                    continue
-            record[f'Avg{field}'] = round(sum(values) / len(values), 2) if values else None
+        for field in timing.values:
+            values = timing.array(field)
+            record[f'Avg{field}'] = round(float(values.mean()), 2) if values.size else None
         # Duration and frame count
-        record['frames'] = len(timing_events)
-        if timing_events:
-            try:
-                start_t = timing_events[0]['time']
-                end_t = timing_events[-1]['time']
-                record['Duration(s)'] = round((end_t - start_t).total_seconds(), 3)
-            except Exception:
-                record['Duration(s)'] = None
+        record['frames'] = len(timing)
+        if timing.times:
+            record['Duration(s)'] = round(
+                (timing.times[-1] - timing.times[0]).total_seconds(), 3)
         return record
 
     def validate_record(self, rec):
@@ -311,18 +676,6 @@ class GenericLogProcessor:
                 return False
         return True
 
-    def save_results(self, output_path):
-        """Write all records to the CSV file."""
-        if not self.results:
-            logging.warning("No results to save.")
-            return
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=self.config['CSV_FIELDS'])
-            writer.writeheader()
-            writer.writerows(self.results)
-        logging.info(f"Saved {len(self.results)} records to {output_path}")
-
     def print_summary(self):
         """Print a summary of processing metrics."""
         print("\n===== Processing Summary =====")
@@ -331,7 +684,7 @@ class GenericLogProcessor:
         print(f"Cycles completed:  {self.metrics['cycles_completed']}")
         if self.metrics.get('cycle_errors'):
             print(f"Cycle errors:      {self.metrics['cycle_errors']}")
-        print(f"Records saved:     {len(self.results)}")
+        print(f"Records saved:     {self.metrics['records_saved']}")
 
 
 # ========== Main ==========
@@ -1,8 +1,13 @@
 import os
+import csv
 import json
+import logging
+import multiprocessing
 import pytest
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from processor import ConfigLoader, GenericLogProcessor
+import processor
+from processor import ConfigLoader, GenericLogProcessor, LogParser
 
 @pytest.fixture
 def tmp_config(tmp_path):
@@ -34,6 +39,38 @@ def tmp_config(tmp_path):
     )
     return str(config_path), cfg
 
+def parser_config(tmp_path, patterns, **overrides):
+    """Loaded config for a technique -> query -> execute sequence."""
+    (tmp_path / "logs").mkdir(exist_ok=True)
+    cfg = {
+        "FOLDER_PATH": str(tmp_path / "logs"),
+        "OUTPUT_CSV": str(tmp_path / "out" / "out.csv"),
+        "LOG_EXTENSIONS": [".log"],
+        "TIMESTAMP_FORMATS": ["%Y/%m/%d %H:%M:%S.%f"],
+        "EVENT_SEQUENCE": list(patterns),
+        "PATTERN_CONFIG": patterns,
+        "CSV_FIELDS": ["SourceFiles", "StartTime", "Tech", "Q", "AvgX",
+                       "Duration(s)", "frames"],
+        "MAX_WORKERS": 1,
+    }
+    cfg.update(overrides)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(cfg))
+    return ConfigLoader.load_config(str(config_path))
+
+STAGES = {
+    "technique": {"Tech": r"Tech=(\w+)"},
+    "query": {"Q": r"Q=(\w+)"},
+    "execute": {"X": r"X=([\d.]+)"},
+}
+
+def cycle_lines(start, tech, q, x):
+    """Log lines for one technique -> query -> execute cycle."""
+    return (f"[{start}.000] Tech={tech}\n"
+            f"[{start}.100] noise without fields\n"
+            f"[{start}.200] Q={q}\n"
+            f"[{start}.300] X={x}\n")
+
 def test_load_config(tmp_config):
     cfg_path, cfg = tmp_config
     loaded = ConfigLoader.load_config(cfg_path)
@@ -53,3 +90,222 @@ def test_full_cycle(tmp_config):
     assert rec["Step"] == "1"
     assert rec["AvgValue"] == 100.0
     assert rec["frames"] == 1
+
+def test_literal_prefix():
+    assert LogParser.literal_prefix(r"StepID=([^,\s]+)") == "StepID="
+    assert LogParser.literal_prefix(r"ab?c") == "a"
+    assert LogParser.literal_prefix(r"(?i)step") == ""
+    assert LogParser.literal_prefix(r"X=(\d+)|Y=(\d+)") == ""
+
+def test_detect_encoding_samples_prefix(tmp_config, tmp_path):
+    cfg_path, cfg = tmp_config
+    parser = LogParser(ConfigLoader.load_config(cfg_path))
+    path = tmp_path / "utf8.log"
+    # Put a two-byte character across the sample boundary
+    pad = "a" * (LogParser.ENCODING_SAMPLE_SIZE - 1)
+    path.write_bytes((pad + "é\n").encode("utf-8"))
+    assert parser.detect_encoding(str(path)) == "utf-8"
+
+def test_detect_encoding_bom(tmp_config, tmp_path):
+    cfg_path, cfg = tmp_config
+    parser = LogParser(ConfigLoader.load_config(cfg_path))
+    path = tmp_path / "utf16.log"
+    path.write_bytes("[2025/07/09 00:00:00.000] Step=1\n".encode("utf-16"))
+    assert parser.detect_encoding(str(path)) == "utf-16"
+
+def test_match_event_keeps_overlapping_fields(tmp_path):
+    patterns = {"technique": {"Tech": r"Tech=(\w+)",
+                              "TechFull": r"TechFull=Tech=(\w+ v\d+)"}}
+    parser = LogParser(parser_config(tmp_path, patterns))
+    ev = parser.parse_line("[2025/07/09 00:00:00.000] TechFull=Tech=abc v2\n", "a.log")
+    assert dict(ev.fields) == {"Tech": "abc", "TechFull": "abc v2"}
+
+def test_match_event_earliest_stage_wins(tmp_path):
+    patterns = {"technique": {"Tech": r"Q=(\w+)"}, "query": {"Q": r"XQ=(\w+)"}}
+    parser = LogParser(parser_config(tmp_path, patterns))
+    ev = parser.parse_line("[2025/07/09 00:00:00.000] XQ=1 Q=2\n", "a.log")
+    assert ev.type == "technique"
+    assert dict(ev.fields) == {"Tech": "1"}
+
+@pytest.mark.parametrize("patterns, line, expected", [
+    ({"technique": {"Tech": r"(?i)tech=(\w+)"}}, "TECH=abc", "abc"),
+    ({"technique": {"Tech": r"Tech=(?P<v>\w+)"}, "query": {"Q": r"Q=(?P<v>\w+)"}},
+     "Q=abc", "abc"),
+    ({"technique": {"Tech": r"Tech=(\w+)"}, "query": {"Q": r"Q=(['\"])(\w+)\1"}},
+     "Q='abc'", "'"),
+])
+def test_match_event_patterns_that_cannot_be_combined(tmp_path, patterns, line, expected):
+    parser = LogParser(parser_config(tmp_path, patterns))
+    ev = parser.parse_line(f"[2025/07/09 00:00:00.000] {line}\n", "a.log")
+    assert ev is not None and ev.fields[0][1] == expected
+
+def test_learned_timestamp_format_is_per_file(tmp_path):
+    cfg = parser_config(tmp_path, STAGES, TIMESTAMP_FORMATS=[
+        "%m/%d/%Y %H:%M:%S.%f", "%d/%m/%Y %H:%M:%S.%f"])
+    first = tmp_path / "first.log"
+    first.write_text("[13/01/2025 00:00:00.000] Tech=a\n")
+    second = tmp_path / "second.log"
+    second.write_text("[01/02/2025 00:00:00.000] Tech=b\n")
+    parser = LogParser(cfg)
+    assert parser.parse_file(str(first))[0].time.month == 1
+    # Listed order applies again in a new file: January 2nd, not February 1st
+    assert parser.parse_file(str(second))[0].time == datetime(2025, 1, 2)
+
+@pytest.mark.parametrize("whole_file_limit", [LogParser.WHOLE_FILE_LIMIT, 0])
+def test_lines_keep_trailing_newline(tmp_path, whole_file_limit):
+    patterns = {"technique": {"Tech": r"Tech=(\w+)\s"}}
+    parser = LogParser(parser_config(tmp_path, patterns))
+    parser.WHOLE_FILE_LIMIT = whole_file_limit
+    path = tmp_path / "a.log"
+    path.write_text("[2025/07/09 00:00:00.000] Tech=a\n"
+                    "[2025/07/09 00:00:01.000] Tech=b\n")
+    assert [ev.fields for ev in parser.parse_file(str(path))] == [
+        (("Tech", "a"),), (("Tech", "b"),)]
+
+def test_gather_files_matches_os_walk_order(tmp_path):
+    cfg = parser_config(tmp_path, STAGES)
+    root = tmp_path / "logs"
+    for sub in ["", "b", "c", "a", "a/d", "c/e"]:
+        (root / sub).mkdir(parents=True, exist_ok=True)
+        (root / sub / "run.log").write_text("")
+    expected = [os.path.join(d, f) for d, _, files in os.walk(cfg["FOLDER_PATH"])
+                for f in files]
+    expected.sort(key=GenericLogProcessor.natural_sort_key)
+    assert GenericLogProcessor(cfg).gather_files() == expected
+
+def test_process_files_streams_records_to_csv(tmp_path):
+    cfg = parser_config(tmp_path, STAGES)
+    (tmp_path / "logs" / "run.log").write_text(
+        cycle_lines("2025/07/09 10:00:00", "a", "q1", "1.5")
+        + cycle_lines("2025/07/09 10:00:05", "b", "q2", "2.5"))
+    proc = GenericLogProcessor(cfg)
+    proc.process_files()
+    with open(cfg["OUTPUT_CSV"], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["StartTime"], r["Tech"], r["Q"], r["AvgX"]) for r in rows] == [
+        ("25/07/09 10:00:00", "a", "q1", "1.5"),
+        ("25/07/09 10:00:05", "b", "q2", "2.5"),
+    ]
+    assert proc.metrics["records_saved"] == 2
+    assert [r["Tech"] for r in proc.results] == ["a", "b"]
+
+def test_cycle_spanning_files_is_merged_by_time(tmp_path):
+    cfg = parser_config(tmp_path, STAGES)
+    logs = tmp_path / "logs"
+    # a.log is written out of order; b.log holds the middle stage
+    (logs / "a.log").write_text("[2025/07/09 10:00:00.300] X=4\n"
+                                "[2025/07/09 10:00:00.000] Tech=a\n")
+    (logs / "b.log").write_text("[2025/07/09 10:00:00.200] Q=q1\n")
+    proc = GenericLogProcessor(cfg)
+    proc.process_files()
+    (rec,) = proc.results
+    assert (rec["Tech"], rec["Q"], rec["AvgX"]) == ("a", "q1", 4.0)
+    assert rec["SourceFiles"].split("+") == sorted(rec["SourceFiles"].split("+"))
+    assert len(rec["SourceFiles"].split("+")) == 2
+
+def test_pool_output_matches_in_process(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    for i in range(4):
+        (logs / f"run{i}.log").write_text(
+            cycle_lines(f"2025/07/09 10:0{i}:00", f"t{i}", f"q{i}", f"{i}.5"))
+    outputs = []
+    for workers in (1, 2):
+        run = tmp_path / f"w{workers}"
+        run.mkdir()
+        cfg = parser_config(run, STAGES, FOLDER_PATH=str(logs), MAX_WORKERS=workers)
+        GenericLogProcessor(cfg).process_files()
+        with open(cfg["OUTPUT_CSV"], encoding="utf-8") as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count("\n") == 5
+
+def test_spawned_worker_logs_debug(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cfg = parser_config(tmp_path, STAGES)
+    log = tmp_path / "logs" / "run.log"
+    log.write_text("[not a time] Tech=a\n")
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=processor._init_worker,
+                             initargs=(cfg, logging.DEBUG)) as ex:
+        assert ex.submit(processor.parse_file, str(log)).result() == []
+    assert "Unrecognized timestamp: not a time" in (tmp_path / "log_processor.log").read_text()
+
+def test_hyperscan_is_opt_in(tmp_path):
+    assert LogParser(parser_config(tmp_path, STAGES))._hs_db is None
+
+def test_hyperscan_matches_re(tmp_path):
+    pytest.importorskip("hyperscan")
+    (tmp_path / "logs").mkdir()
+    log = tmp_path / "logs" / "run.log"
+    log.write_text("[2025/07/09 10:00:00.000] Tech=a Tech=b\n"
+                   "[2025/07/09 10:00:00.100] noise\n"
+                   "[2025/07/09 10:00:00.200] XQ=1 Q=é1\n"
+                   "[2025/07/09 10:00:00.300] X=2.5 Q=late", encoding="utf-8")
+    parsed = []
+    for use in (False, True):
+        parser = LogParser(parser_config(tmp_path, STAGES, USE_HYPERSCAN=use))
+        assert (parser._hs_db is not None) == use
+        parsed.append([(e.time, e.type, e.fields) for e in parser.parse_file(str(log))])
+    assert parsed[0] == parsed[1]
+    assert [t for _, t, _ in parsed[1]] == ["technique", "query", "query"]
+
+def test_hyperscan_needs_literal_prefixes(tmp_path):
+    pytest.importorskip("hyperscan")
+    patterns = {"technique": {"Tech": r"(?:Tech|T)=(\w+)"}}
+    parser = LogParser(parser_config(tmp_path, patterns, USE_HYPERSCAN=True))
+    assert parser._hs_db is None
+
+def test_build_record_skips_non_numeric_timing_values(tmp_path):
+    proc = GenericLogProcessor(parser_config(tmp_path, STAGES))
+    start = datetime(2025, 7, 9, 10, 0, 0)
+    timing = processor.TimingSeries(["X"])
+    for i, x in enumerate(["1.5", "abc", "", "2.5"]):
+        timing.add(processor.Event(start.replace(second=i + 1), "run.log",
+                                   "execute", 2, (("X", x),)))
+    cycle = [processor.Event(start, "run.log", "technique", 0, (("Tech", "a"),)),
+             processor.Event(start, "run.log", "query", 1, (("Q", "q1"),)),
+             timing]
+    rec = proc.build_record(cycle, {"run.log"})
+    assert rec["AvgX"] == 2.0
+    assert rec["frames"] == 4
+    assert rec["Duration(s)"] == 3.0
+    assert proc.validate_record(rec)
+
+@pytest.mark.parametrize("workers", [0, -2, "4"])
+def test_load_config_rejects_invalid_max_workers(tmp_path, workers):
+    with pytest.raises(SystemExit):
+        parser_config(tmp_path, STAGES, MAX_WORKERS=workers)
+
+def test_single_cpu_parses_in_process(tmp_path, monkeypatch):
+    cfg = parser_config(tmp_path, STAGES, MAX_WORKERS=None)
+    for i in range(2):
+        (tmp_path / "logs" / f"run{i}.log").write_text(
+            cycle_lines(f"2025/07/09 10:0{i}:00", f"t{i}", f"q{i}", "1.5"))
+    monkeypatch.setattr(processor.os, "cpu_count", lambda: 1)
+    monkeypatch.setattr(processor, "ProcessPoolExecutor", None)
+    proc = GenericLogProcessor(cfg)
+    proc.process_files()
+    assert proc.metrics["records_saved"] == 2
+
+def test_hand_built_config_without_optional_keys(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "run.log").write_text(cycle_lines("2025/07/09 10:00:00", "a", "q1", "1.5"))
+    cfg = {
+        "FOLDER_PATH": str(logs),
+        "OUTPUT_CSV": str(tmp_path / "out.csv"),
+        "RENAME_LOGS": False,
+        "NEW_EXT": ".txt",
+        "LOG_EXTENSIONS": [".log"],
+        "TIMESTAMP_FORMATS": ["%Y/%m/%d %H:%M:%S.%f"],
+        "EVENT_SEQUENCE": list(STAGES),
+        "PATTERN_CONFIG": STAGES,
+        "CSV_FIELDS": ["SourceFiles", "StartTime", "Tech", "Q", "AvgX",
+                       "Duration(s)", "frames"],
+        "LOG_LEVEL": "INFO",
+    }
+    proc = GenericLogProcessor(cfg)
+    proc.process_files()
+    assert proc.parser._hs_db is None
+    assert proc.metrics["records_saved"] == 1